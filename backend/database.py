@@ -1,22 +1,42 @@
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict
-from pymongo import MongoClient, ReturnDocument
+from bson.codec_options import CodecOptions
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis.asyncio import Redis
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.environ.get("DATABASE_NAME", "secret_closet")
 
-client = MongoClient(DATABASE_URL)
-db = client[DATABASE_NAME]
+# Keep a warm pool of sockets per worker and fail fast when the server is
+# unreachable. Wire traffic is zstd-compressed (zstandard is a requirement).
+client = AsyncIOMotorClient(
+    DATABASE_URL,
+    maxPoolSize=50,
+    minPoolSize=10,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=2000,
+    socketTimeoutMS=5000,
+    retryWrites=True,
+    compressors="zstd",
+)
+# BSON decodes straight to the Python types the API returns, with aware UTC datetimes
+db = client.get_database(DATABASE_NAME, codec_options=CodecOptions(document_class=dict, tz_aware=True))
 
+# Optional response cache for hot listing endpoints; disabled when unset
+REDIS_URL = os.environ.get("REDIS_URL")
+cache = Redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
 
-def create_document(collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    now = datetime.utcnow()
+
+async def create_document(collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
     data.setdefault("created_at", now)
     data.setdefault("updated_at", now)
-    res = db[collection_name].insert_one(data)
-    return db[collection_name].find_one({"_id": res.inserted_id})
+    # insert_one sets data["_id"] in place, so the caller's dict is the document
+    await db[collection_name].insert_one(data)
+    return data
+
 
+async def get_documents(collection_name: str, filter_dict: Dict[str, Any] | None = None, limit: int = 50):
+    return await db[collection_name].find(filter_dict or {}).limit(limit).to_list(length=limit)
 
-def get_documents(collection_name: str, filter_dict: Dict[str, Any] | None = None, limit: int = 50):
-    return list(db[collection_name].find(filter_dict or {}).limit(limit))
@@ -1,13 +1,17 @@
+import orjson
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from fastapi.responses import ORJSONResponse
+from typing import Callable, List, Optional, Dict, Any
+from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from database import db, create_document, get_documents
+from database import cache, client, db, create_document, get_documents
 from schemas import ProductIn, ProductOut, OrderIn, OrderOut
 
-app = FastAPI(title="Secret Closet API", version="0.1.0")
+app = FastAPI(title="Secret Closet API", version="0.1.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,57 +22,210 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def warm_connection_pool():
+    # Open the first pooled sockets before traffic arrives
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        pass
+
+
+# Case-insensitive comparison for name prefix (typeahead) lookups
+NAME_COLLATION = {"locale": "en", "strength": 2}
+
+# Compound index backing a category filter sorted by the given field
+CATEGORY_SORT_HINTS = {
+    "price": [("category", 1), ("price", 1)],
+    "created_at": [("category", 1), ("created_at", -1)],
+    "rating": [("category", 1), ("rating", -1)],
+}
+
+# Seconds before an unreleased seed lock is reaped (plus up to a minute of
+# TTL-monitor delay)
+SEED_LOCK_TTL = 300
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    try:
+        await db["seed_lock"].create_index([("created_at", 1)], expireAfterSeconds=SEED_LOCK_TTL)
+        products = db["product"]
+        await products.create_index([("category", 1)])
+        await products.create_index([("category", 1), ("price", 1)])
+        await products.create_index([("category", 1), ("created_at", -1)])
+        await products.create_index([("category", 1), ("rating", -1)])
+        await products.create_index([("is_featured", 1), ("rating", -1)])
+        await products.create_index([("created_at", -1)])
+        await products.create_index([("name", 1)], collation=NAME_COLLATION)
+        await products.create_index(
+            [("name", "text"), ("brand", "text"), ("tags", "text")],
+            weights={"name": 10, "brand": 5, "tags": 3},
+        )
+    except Exception:
+        # Index builds must never block startup
+        pass
+
+
+# Projections
+
+# Fields read by to_product_out on listing pages; description/specs/options
+# are only sent by the product detail endpoint.
+PRODUCT_LIST_PROJECTION = {
+    "name": 1,
+    "brand": 1,
+    "category": 1,
+    "price": 1,
+    "sale_price": 1,
+    "stock": 1,
+    "images": 1,
+    "is_featured": 1,
+    "tags": 1,
+    "rating": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+# Everything ProductOut carries, for write endpoints that echo the product
+PRODUCT_DETAIL_PROJECTION = {
+    **PRODUCT_LIST_PROJECTION,
+    "description": 1,
+    "specs": 1,
+    "options": 1,
+}
+
+# Fields read when building OrderOut
+ORDER_PROJECTION = {
+    "items": 1,
+    "shipping": 1,
+    "payment": 1,
+    "subtotal": 1,
+    "shipping_cost": 1,
+    "discount": 1,
+    "total": 1,
+    "status": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+
 # Utility
 
 def to_product_out(doc: Dict[str, Any]) -> ProductOut:
-    return ProductOut(
+    return ProductOut.model_construct(
         id=str(doc.get("_id")),
         name=doc["name"],
         brand=doc.get("brand", ""),
         category=doc.get("category", ""),
-        price=float(doc.get("price", 0.0)),
-        sale_price=float(doc.get("sale_price")) if doc.get("sale_price") is not None else None,
-        stock=int(doc.get("stock", 0)),
+        price=doc.get("price", 0.0),
+        sale_price=doc.get("sale_price"),
+        stock=doc.get("stock", 0),
         description=doc.get("description"),
-        images=list(doc.get("images", [])),
+        images=doc.get("images", []),
         specs=doc.get("specs"),
         options=doc.get("options"),
-        is_featured=bool(doc.get("is_featured", False)),
-        tags=list(doc.get("tags", [])),
-        rating=float(doc.get("rating", 0.0)),
-        created_at=doc.get("created_at", datetime.utcnow()),
-        updated_at=doc.get("updated_at", datetime.utcnow()),
+        is_featured=doc.get("is_featured", False),
+        tags=doc.get("tags", []),
+        rating=doc.get("rating", 0.0),
+        created_at=doc.get("created_at"),
+        updated_at=doc.get("updated_at"),
     )
 
 
+def project_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename _id to id (and drop any textScore) on a projected document, ready for ORJSONResponse"""
+    return {"id": str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id" and k != "score"}}
+
+
+async def to_list_hinted(make_cursor: Callable[[], Any], hint: Optional[List[Any]], length: int) -> List[Dict[str, Any]]:
+    """Run make_cursor() pinned to an index, falling back to the planner if the index is missing"""
+    if hint:
+        try:
+            return await make_cursor().hint(hint).to_list(length=length)
+        except OperationFailure:
+            pass
+    return await make_cursor().to_list(length=length)
+
+
+async def fetch_products_by_ids(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Resolve many product ids with a single $in query, keyed by str(_id)"""
+    oids = [ObjectId(i) for i in set(ids) if ObjectId.is_valid(i)]
+    if not oids:
+        return {}
+    cursor = db["product"].find({"_id": {"$in": oids}}, PRODUCT_LIST_PROJECTION)
+    return {str(d["_id"]): d async for d in cursor}
+
+
+# Cache
+
+LISTING_CACHE_TTL = 60
+CATEGORIES_CACHE_KEY = "cats:v1"
+
+
+async def cache_get(key: str) -> Any:
+    if cache is None:
+        return None
+    try:
+        val = await cache.get(key)
+    except Exception:
+        # A cache outage falls through to Mongo
+        return None
+    return orjson.loads(val) if val else None
+
+
+async def cache_set(key: str, value: Any) -> None:
+    if cache is None:
+        return
+    try:
+        await cache.setex(key, LISTING_CACHE_TTL, orjson.dumps(value))
+    except Exception:
+        pass
+
+
+async def invalidate_listing_cache() -> None:
+    if cache is None:
+        return
+    try:
+        keys = [CATEGORIES_CACHE_KEY]
+        for pattern in ("best:*", "new:*"):
+            keys.extend([k async for k in cache.scan_iter(match=pattern)])
+        await cache.delete(*keys)
+    except Exception:
+        pass
+
+
 # Categories
 @app.get("/api/categories", response_model=List[str])
 async def get_categories():
-    pipeline = [
-        {"$group": {"_id": "$category"}},
-        {"$sort": {"_id": 1}},
-    ]
-    categories = [d["_id"] for d in db["product"].aggregate(pipeline) if d.get("_id")]
-    return categories
+    cached = await cache_get(CATEGORIES_CACHE_KEY)
+    if cached is not None:
+        return cached
+    cats = await db["product"].distinct("category")
+    result = sorted(c for c in cats if c)
+    await cache_set(CATEGORIES_CACHE_KEY, result)
+    return result
 
 
 # Products
-@app.get("/api/products", response_model=List[ProductOut])
+# Hot path: projected documents go straight to orjson, skipping Pydantic
+# and response-model validation entirely.
+@app.get("/api/products", response_model=None)
 async def list_products(
     category: Optional[str] = None,
     q: Optional[str] = None,
+    prefix: bool = False,  # treat q as a name prefix (typeahead)
     sort: Optional[str] = None,  # price_asc | price_desc | newest | rating
     limit: int = 50,
 ):
     query: Dict[str, Any] = {}
     if category:
         query["category"] = category
-    if q:
-        query["$or"] = [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"brand": {"$regex": q, "$options": "i"}},
-            {"tags": {"$regex": q, "$options": "i"}},
-        ]
+    if q and prefix:
+        # $text only matches whole words. A collated range query is an index
+        # range scan on name_1; an /i regex cannot use the collated index.
+        query["name"] = {"$gte": q, "$lt": q + "\uffff"}
+    elif q:
+        query["$text"] = {"$search": q}
 
     sort_stage = None
     if sort == "price_asc":
@@ -80,91 +237,130 @@ async def list_products(
     elif sort == "rating":
         sort_stage = ("rating", -1)
 
-    cursor = db["product"].find(query)
-    if sort_stage:
-        cursor = cursor.sort([sort_stage])
-    cursor = cursor.limit(limit)
-    return [to_product_out(d) for d in await cursor.to_list(length=limit)] if hasattr(cursor, 'to_list') else [to_product_out(d) for d in cursor]
+    projection = PRODUCT_LIST_PROJECTION
+    if q and not prefix and sort_stage is None:
+        # Rank search hits by relevance when no explicit order was requested
+        projection = {**PRODUCT_LIST_PROJECTION, "score": {"$meta": "textScore"}}
+        sort_stage = ("score", {"$meta": "textScore"})
+
+    def make_cursor():
+        cursor = db["product"].find(query, projection)
+        if q and prefix:
+            cursor = cursor.collation(NAME_COLLATION)
+        if sort_stage:
+            cursor = cursor.sort([sort_stage])
+        return cursor.limit(limit)
 
+    # Pin category listings to their compound index; $text and collated
+    # queries choose their own index.
+    hint = CATEGORY_SORT_HINTS.get(sort_stage[0]) if category and sort_stage and not q else None
+    docs = await to_list_hinted(make_cursor, hint, limit)
+    return ORJSONResponse([project_doc(d) for d in docs])
 
-@app.get("/api/products/best", response_model=List[ProductOut])
+
+@app.get("/api/products/best", response_model=None)
 async def best_products(limit: int = 8):
-    cursor = db["product"].find({"is_featured": True}).sort([("rating", -1)]).limit(limit)
-    return [to_product_out(d) for d in cursor]
+    key = f"best:{limit}"
+    cached = await cache_get(key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    docs = await to_list_hinted(
+        lambda: db["product"].find({"is_featured": True}, PRODUCT_LIST_PROJECTION).sort([("rating", -1)]).limit(limit),
+        [("is_featured", 1), ("rating", -1)],
+        limit,
+    )
+    result = [project_doc(d) for d in docs]
+    await cache_set(key, result)
+    return ORJSONResponse(result)
 
 
-@app.get("/api/products/new", response_model=List[ProductOut])
+@app.get("/api/products/new", response_model=None)
 async def new_products(limit: int = 8):
-    cursor = db["product"].find({}).sort([("created_at", -1)]).limit(limit)
-    return [to_product_out(d) for d in cursor]
+    key = f"new:{limit}"
+    cached = await cache_get(key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    cursor = db["product"].find({}, PRODUCT_LIST_PROJECTION).sort([("created_at", -1)]).limit(limit)
+    result = [project_doc(d) for d in await cursor.to_list(length=limit)]
+    await cache_set(key, result)
+    return ORJSONResponse(result)
 
 
-@app.get("/api/products/{id}", response_model=ProductOut)
+@app.get("/api/products/{id}", response_model=None)
 async def get_product(id: str):
-    doc = db["product"].find_one({"_id": ObjectId(id)})
+    doc = await db["product"].find_one({"_id": ObjectId(id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Product not found")
-    return to_product_out(doc)
+    return ORJSONResponse(project_doc(doc))
 
 
 # Admin Products
 @app.post("/api/admin/products", response_model=ProductOut)
 async def create_product(p: ProductIn):
-    data = p.dict()
-    now = datetime.utcnow()
+    data = p.model_dump()
+    now = datetime.now(timezone.utc)
     data.update({"created_at": now, "updated_at": now})
-    inserted = create_document("product", data)
+    inserted = await create_document("product", data)
+    await invalidate_listing_cache()
     return to_product_out(inserted)
 
 
 @app.put("/api/admin/products/{id}", response_model=ProductOut)
 async def update_product(id: str, p: ProductIn):
-    now = datetime.utcnow()
-    update = {"$set": {**p.dict(), "updated_at": now}}
-    res = db["product"].find_one_and_update({"_id": ObjectId(id)}, update, return_document=True)
+    now = datetime.now(timezone.utc)
+    update = {"$set": {**p.model_dump(), "updated_at": now}}
+    res = await db["product"].find_one_and_update(
+        {"_id": ObjectId(id)},
+        update,
+        projection=PRODUCT_DETAIL_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
     if not res:
         raise HTTPException(status_code=404, detail="Product not found")
+    await invalidate_listing_cache()
     return to_product_out(res)
 
 
 # Orders
 @app.post("/api/orders", response_model=OrderOut)
 async def create_order(order: OrderIn):
-    now = datetime.utcnow()
-    doc = order.dict()
+    now = datetime.now(timezone.utc)
+    doc = order.model_dump()
     doc.update({"status": "received", "created_at": now, "updated_at": now})
-    inserted = create_document("order", doc)
-    return OrderOut(id=str(inserted["_id"]), **order.dict(), status="received", created_at=inserted["created_at"], updated_at=inserted["updated_at"]) 
+    inserted = await create_document("order", doc)
+    return OrderOut(id=str(inserted["_id"]), **order.model_dump(), status="received", created_at=inserted["created_at"], updated_at=inserted["updated_at"]) 
 
 
-@app.get("/api/orders", response_model=List[OrderOut])
+@app.get("/api/orders", response_model=None)
 async def list_orders(email: Optional[str] = None, limit: int = 50):
     query: Dict[str, Any] = {}
     if email:
         query["shipping.email"] = email
-    cursor = db["order"].find(query).sort([("created_at", -1)]).limit(limit)
-    results: List[OrderOut] = []
-    for d in cursor:
-        results.append(OrderOut(
-            id=str(d["_id"]),
-            items=d.get("items", []),
-            shipping=d.get("shipping"),
-            payment=d.get("payment"),
-            subtotal=float(d.get("subtotal", 0)),
-            shipping_cost=float(d.get("shipping_cost", 0)),
-            discount=float(d.get("discount", 0)),
-            total=float(d.get("total", 0)),
-            status=d.get("status", "received"),
-            created_at=d.get("created_at", now),
-            updated_at=d.get("updated_at", now),
-        ))
-    return results
+    cursor = db["order"].find(query, ORDER_PROJECTION).sort([("created_at", -1)]).limit(limit).batch_size(limit)
+    docs = await cursor.to_list(length=limit)
+
+    # Fill in missing item images from the catalog with one batched lookup
+    missing = [i["product_id"] for d in docs for i in d.get("items", []) if not i.get("image")]
+    if missing:
+        products = await fetch_products_by_ids(missing)
+        for d in docs:
+            for item in d.get("items", []):
+                product = products.get(item["product_id"])
+                if not item.get("image") and product and product.get("images"):
+                    item["image"] = product["images"][0]
+
+    return ORJSONResponse([project_doc(d) for d in docs])
 
 
 @app.put("/api/orders/{id}/status", response_model=OrderOut)
 async def update_order_status(id: str, status: str):
-    now = datetime.utcnow()
-    res = db["order"].find_one_and_update({"_id": ObjectId(id)}, {"$set": {"status": status, "updated_at": now}}, return_document=True)
+    now = datetime.now(timezone.utc)
+    res = await db["order"].find_one_and_update(
+        {"_id": ObjectId(id)},
+        {"$set": {"status": status, "updated_at": now}},
+        projection=ORDER_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
     if not res:
         raise HTTPException(status_code=404, detail="Order not found")
     return OrderOut(
@@ -177,12 +373,13 @@ async def update_order_status(id: str, status: str):
         discount=float(res.get("discount", 0)),
         total=float(res.get("total", 0)),
         status=res.get("status", "received"),
-        created_at=res.get("created_at", now),
-        updated_at=res.get("updated_at", now),
+        created_at=res.get("created_at"),
+        updated_at=now,
     )
 
 
 # Seeding
+
 SAMPLE_PRODUCTS = [
     {
         "name": "Essential Cotton Tee",
@@ -262,13 +459,27 @@ SAMPLE_PRODUCTS = [
 @app.post("/api/admin/seed")
 async def seed():
     col = db["product"]
-    if col.count_documents({}) == 0:
-        now = datetime.utcnow()
-        for p in SAMPLE_PRODUCTS:
-            data = {**p, "created_at": now, "updated_at": now}
-            create_document("product", data)
-        return {"seeded": True, "count": len(SAMPLE_PRODUCTS)}
-    return {"seeded": False, "count": col.count_documents({})}
+    n = await col.estimated_document_count()
+    if n != 0:
+        return {"seeded": False, "count": n}
+
+    # Only one worker may seed; the others see the sentinel as a duplicate key.
+    # A TTL index expires the sentinel if its holder dies before releasing it.
+    try:
+        await db["seed_lock"].insert_one({"_id": "product", "created_at": datetime.now(timezone.utc)})
+    except DuplicateKeyError:
+        return {"seeded": False, "count": n}
+    try:
+        now = datetime.now(timezone.utc)
+        ops = [
+            UpdateOne({"name": p["name"]}, {"$setOnInsert": {**p, "created_at": now, "updated_at": now}}, upsert=True)
+            for p in SAMPLE_PRODUCTS
+        ]
+        res = await col.bulk_write(ops, ordered=False)
+    finally:
+        await db["seed_lock"].delete_one({"_id": "product"})
+    await invalidate_listing_cache()
+    return {"seeded": res.upserted_count > 0, "count": res.upserted_count}
 
 
 @app.on_event("startup")
@@ -1,14 +1,23 @@
 import os
-from fastapi import FastAPI, HTTPException, Query
+import base64
+import hashlib
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone
+from functools import lru_cache
 
 from database import db, create_document, get_documents
+import bson
+import orjson
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from cachetools import TTLCache
 
-app = FastAPI(title="Secret Closet API")
+app = FastAPI(title="Secret Closet API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,36 +32,156 @@ app.add_middleware(
 # Utilities
 # -----------------------------
 
+# Homepage listings (categories, best sellers, new arrivals) change rarely,
+# so each worker keeps the encoded JSON bodies (with their caching headers)
+# in memory for a short while.
+_cache: TTLCache = TTLCache(maxsize=256, ttl=120)
+# list_products totals per filter, so paging through one filter counts once
+_count_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+
+# Cacheable homepage GETs may also be served by browsers and CDNs
+CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+def clear_product_caches() -> None:
+    _cache.clear()
+    _count_cache.clear()
+
+
+def cache_entry(body: bytes) -> Tuple[bytes, Dict[str, str]]:
+    # The ETag hashes the exact bytes sent, so it changes whenever they do,
+    # whichever worker or cache fill produced them
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    return body, {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def dump_json(payload: Any) -> bytes:
+    # One native pass over raw Mongo documents: orjson encodes datetimes
+    # itself and ObjectIds via _json_default, so serialize_doc is skipped
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_NAIVE_UTC)
+
+
+def json_body(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    # Already-encoded JSON; bypasses FastAPI's jsonable_encoder entirely
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def project_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+# Case-insensitive comparison for name prefix (typeahead) lookups
+NAME_COLLATION = {"locale": "en", "strength": 2}
+
+# Listing cards only need these; get_product returns the full document.
+# created_at_ts/price/rating also feed the keyset cursor.
+LIST_PROJECTION = {
+    "name": 1,
+    "brand": 1,
+    "price": 1,
+    "sale_price": 1,
+    "category": 1,
+    "images": {"$slice": 1},
+    "rating": 1,
+    "is_featured": 1,
+    "tags": 1,
+    "created_at": 1,
+    "created_at_ts": 1,
+}
+# Same shape for aggregation $project, where $slice takes an expression and
+# yields null on a missing field; default to [] like ProductIn does
+LIST_PROJECTION_AGG = {**LIST_PROJECTION, "images": {"$slice": [{"$ifNull": ["$images", []]}, 1]}}
+
+
+def creation_stamps(now: datetime) -> Dict[str, Any]:
+    # Timestamps are stored pre-serialized: ISO strings for display and
+    # epoch millis for sorting/range queries, so reads skip datetime handling
+    return {
+        "created_at": now.isoformat(),
+        "created_at_ts": int(now.timestamp() * 1000),
+        "updated_at": now.isoformat(),
+    }
+
+
+@lru_cache(maxsize=4096)
+def _to_oid(id_str: str) -> ObjectId:
+    # ObjectIds are immutable, so hot product/order ids can share one instance
+    return ObjectId(id_str)
+
+
 def to_object_id(id_str: str) -> ObjectId:
     try:
-        return ObjectId(id_str)
+        return _to_oid(id_str)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
 
+def text_search_terms(q: str) -> str:
+    # Strip $text operators (quoted phrases, -negation) from user input
+    return " ".join(t.lstrip("-") for t in q.replace('"', " ").split())
+
+
+def get_path(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def encode_page_cursor(value: Any, last_id: ObjectId) -> str:
+    # BSON keeps the sort value's type (float vs int) intact
+    return base64.urlsafe_b64encode(bson.encode({"v": value, "id": last_id})).decode()
+
+
+def decode_page_cursor(token: str) -> Tuple[Any, ObjectId]:
+    try:
+        data = bson.decode(base64.urlsafe_b64decode(token.encode()))
+        value, last_id = data["v"], data["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # The value lands in an equality clause, so anything but a plain scalar
+    # (e.g. {"$ne": null}) would turn into a query operator
+    if not isinstance(last_id, ObjectId) or type(value) not in _CURSOR_VALUE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+
+# created_at_ts (epoch millis) overflows int32, so BSON decodes it as Int64
+_CURSOR_VALUE_TYPES = (int, bson.int64.Int64, float, str, type(None))
+
+
 def serialize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     if not doc:
         return doc
     doc["id"] = str(doc.pop("_id")) if "_id" in doc else None
-    # Convert datetimes to isoformat
-    for k, v in list(doc.items()):
-        if isinstance(v, datetime):
-            doc[k] = v.isoformat()
-        if isinstance(v, dict):
-            doc[k] = serialize_doc(v)
-        if isinstance(v, list):
-            new_list = []
-            for item in v:
-                if isinstance(item, dict):
-                    new_list.append(serialize_doc(item))
-                elif isinstance(item, datetime):
-                    new_list.append(item.isoformat())
-                else:
-                    new_list.append(item)
-            doc[k] = new_list
+    # Convert ObjectIds to str, recursing into nested dicts/lists via one
+    # exact-type lookup per value
+    get = _SERIALIZERS.get
+    for k, v in doc.items():
+        handler = get(type(v))
+        if handler is not None:
+            doc[k] = handler(v)
     return doc
 
 
+def _serialize_list(items: List[Any]) -> List[Any]:
+    get = _SERIALIZERS.get
+    return [h(item) if (h := get(type(item))) is not None else item for item in items]
+
+
+_SERIALIZERS = {
+    dict: serialize_doc,
+    list: _serialize_list,
+    ObjectId: str,
+}
+
+
 # -----------------------------
 # Models
 # -----------------------------
@@ -123,12 +252,12 @@ class OrderOut(BaseModel):
 # -----------------------------
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Secret Closet API is running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -144,7 +273,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "Unknown"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:20]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -161,38 +290,68 @@ def test_database():
 # -----------------------------
 
 @app.get("/api/categories", response_model=List[str])
-def get_categories():
+async def get_categories(request: Request):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    cats = db.product.distinct("category")
-    return sorted([c for c in cats if isinstance(c, str)])
+    key = ("categories",)
+    entry = _cache.get(key)
+    if entry is None:
+        cats = await db.product.distinct("category")
+        entry = cache_entry(dump_json(sorted([c for c in cats if isinstance(c, str)])))
+        _cache[key] = entry
+    body, headers = entry
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return json_body(body, headers)
 
 
 # -----------------------------
 # Products
 # -----------------------------
 
+async def count_products(filter_q: Dict[str, Any], collation: Optional[Dict[str, Any]] = None) -> int:
+    if not filter_q:
+        # Collection metadata, no scan
+        return await db.product.estimated_document_count()
+    key = bson.encode(filter_q)
+    total = _count_cache.get(key)
+    if total is None:
+        total = await db.product.count_documents(filter_q, collation=collation)
+        _count_cache[key] = total
+    return total
+
+
 @app.get("/api/products")
-def list_products(
+async def list_products(
     q: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
     sort: Optional[str] = Query(None, description="price_asc|price_desc|new|popular"),
+    prefix: bool = Query(False, description="Match q as a name prefix (typeahead)"),
     page: int = Query(1, ge=1),
-    limit: int = Query(12, ge=1, le=60)
+    after: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    limit: int = Query(12, ge=1, le=60),
+    with_total: bool = Query(True, description="Set false to skip counting (total is null)"),
 ):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
     filter_q: Dict[str, Any] = {}
-    if q:
-        filter_q["$or"] = [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"brand": {"$regex": q, "$options": "i"}},
-            {"category": {"$regex": q, "$options": "i"}},
-            {"tags": {"$regex": q, "$options": "i"}},
-        ]
+    collation = None
+    terms = text_search_terms(q) if q else ""
+    if q and prefix:
+        # $text matches whole words only, so typeahead seeks a name range
+        # under a case-insensitive collation. $regex ignores collations and
+        # could not use the collated index, even when anchored.
+        filter_q["name"] = {"$gte": q, "$lt": q + "\uffff"}
+        collation = NAME_COLLATION
+    elif terms:
+        filter_q["$text"] = {"$search": terms}
+    elif q:
+        # Only $text operator characters (e.g. "-" or '"'): nothing can match,
+        # and dropping the predicate would return the whole catalog
+        return json_body(dump_json({"items": [], "page": page, "limit": limit, "total": 0 if with_total else None, "next_cursor": None}))
     if category:
         filter_q["category"] = category
     price_filter = {}
@@ -209,71 +368,138 @@ def list_products(
     elif sort == "price_desc":
         sort_tuple = ("price", -1)
     elif sort == "new":
-        sort_tuple = ("created_at", -1)
+        sort_tuple = ("created_at_ts", -1)
     elif sort == "popular":
         sort_tuple = ("rating.count", -1)
-
-    cursor = db.product.find(filter_q)
-    total = cursor.count() if hasattr(cursor, 'count') else db.product.count_documents(filter_q)
-    if sort_tuple:
-        cursor = cursor.sort([sort_tuple])
-    cursor = cursor.skip((page - 1) * limit).limit(limit)
-    items = [serialize_doc(d) for d in list(cursor)]
-    return {"items": items, "page": page, "limit": limit, "total": total}
+    elif terms and not prefix:
+        sort_tuple = ("score", {"$meta": "textScore"})
+
+    # Keyset pagination: every order except text relevance gets an _id
+    # tiebreak, so `after` seeks past the previous page instead of skipping.
+    keyset = not (sort_tuple and sort_tuple[0] == "score")
+    if keyset:
+        sort_field, sort_dir = sort_tuple or ("_id", 1)
+        sort_spec = [(sort_field, sort_dir)] if sort_field == "_id" else [(sort_field, sort_dir), ("_id", sort_dir)]
+    else:
+        sort_spec = [sort_tuple]
+
+    page_q = filter_q
+    if after and keyset:
+        last_value, last_id = decode_page_cursor(after)
+        op = "$gt" if sort_dir == 1 else "$lt"
+        if sort_field == "_id":
+            seek = {"_id": {op: last_id}}
+        else:
+            seek = {"$or": [{sort_field: {op: last_value}}, {sort_field: last_value, "_id": {op: last_id}}]}
+        page_q = {"$and": [filter_q, seek]} if filter_q else seek
+
+    count_key = bson.encode(filter_q)
+    if with_total and filter_q and count_key not in _count_cache and not (after and keyset):
+        # Page and total in one round-trip. $sort stays ahead of $facet so it
+        # can still walk an index; stages inside $facet cannot.
+        pipeline = [
+            {"$match": filter_q},
+            {"$sort": dict(sort_spec)},
+            {"$facet": {
+                "items": [{"$skip": (page - 1) * limit}, {"$limit": limit}, {"$project": LIST_PROJECTION_AGG}],
+                "total": [{"$count": "n"}],
+            }},
+        ]
+        result = (await db.product.aggregate(pipeline, collation=collation).to_list(length=1))[0]
+        docs = result["items"]
+        total = result["total"][0]["n"] if result["total"] else 0
+        _count_cache[count_key] = total
+    else:
+        cursor = db.product.find(page_q, LIST_PROJECTION, collation=collation).sort(sort_spec)
+        total = await count_products(filter_q, collation) if with_total else None
+        if not (after and keyset):
+            cursor = cursor.skip((page - 1) * limit)
+        docs = await cursor.limit(limit).to_list(length=limit)
+
+    next_cursor = None
+    if keyset and len(docs) == limit:
+        last = docs[-1]
+        next_cursor = encode_page_cursor(get_path(last, sort_field), last["_id"])
+    items = [project_doc(d) for d in docs]
+    return json_body(dump_json({"items": items, "page": page, "limit": limit, "total": total, "next_cursor": next_cursor}))
 
 
 @app.get("/api/products/best")
-def best_sellers(limit: int = 8):
+async def best_sellers(request: Request, limit: int = 8):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    cursor = db.product.find({}).sort([( "rating.count", -1)]).limit(limit)
-    return [serialize_doc(d) for d in cursor]
+    key = ("best", limit)
+    entry = _cache.get(key)
+    if entry is None:
+        cursor = db.product.find({}, LIST_PROJECTION).sort([( "rating.count", -1)]).limit(limit)
+        entry = cache_entry(dump_json([project_doc(d) for d in await cursor.to_list(length=limit)]))
+        _cache[key] = entry
+    body, headers = entry
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return json_body(body, headers)
 
 
 @app.get("/api/products/new")
-def new_arrivals(limit: int = 8):
+async def new_arrivals(request: Request, limit: int = 8):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    cursor = db.product.find({}).sort([( "created_at", -1)]).limit(limit)
-    return [serialize_doc(d) for d in cursor]
+    key = ("new", limit)
+    entry = _cache.get(key)
+    if entry is None:
+        cursor = db.product.find({}, LIST_PROJECTION).sort([( "created_at_ts", -1)]).limit(limit)
+        entry = cache_entry(dump_json([project_doc(d) for d in await cursor.to_list(length=limit)]))
+        _cache[key] = entry
+    body, headers = entry
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return json_body(body, headers)
 
 
 @app.get("/api/products/{product_id}", response_model=ProductOut)
-def get_product(product_id: str):
+async def get_product(product_id: str):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    doc = db.product.find_one({"_id": to_object_id(product_id)})
+    doc = await db.product.find_one({"_id": to_object_id(product_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Product not found")
     return serialize_doc(doc)
 
 
 @app.post("/api/admin/products", response_model=ProductOut)
-def create_product(product: ProductIn):
+async def create_product(product: ProductIn):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     data = product.model_dump()
     now = datetime.now(timezone.utc)
     data.update({
-        "created_at": now,
-        "updated_at": now,
+        **creation_stamps(now),
         "rating": {"average": 0.0, "count": 0}
     })
-    inserted_id = db.product.insert_one(data).inserted_id
-    doc = db.product.find_one({"_id": inserted_id})
-    return serialize_doc(doc)
+    # insert_one sets data["_id"], so the stored document is already in hand
+    await db.product.insert_one(data)
+    clear_product_caches()
+    return serialize_doc(data)
 
 
 @app.put("/api/admin/products/{product_id}", response_model=ProductOut)
-def update_product(product_id: str, product: ProductIn):
+async def update_product(product_id: str, product: ProductIn):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
+    oid = to_object_id(product_id)
     data = product.model_dump()
-    data["updated_at"] = datetime.now(timezone.utc)
-    res = db.product.update_one({"_id": to_object_id(product_id)}, {"$set": data})
-    if res.matched_count == 0:
+    data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    try:
+        doc = await db.product.find_one_and_update(
+            {"_id": oid},
+            {"$set": data},
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Product name already exists")
+    if doc is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    doc = db.product.find_one({"_id": to_object_id(product_id)})
+    clear_product_caches()
     return serialize_doc(doc)
 
 
@@ -282,24 +508,23 @@ def update_product(product_id: str, product: ProductIn):
 # -----------------------------
 
 @app.post("/api/orders", response_model=OrderOut)
-def create_order(order: OrderIn):
+async def create_order(order: OrderIn):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
     total_amount = sum(item.price * item.quantity for item in order.items)
     now = datetime.now(timezone.utc)
-    order_number = f"ORD-{now.strftime('%Y%m%d%H%M%S')}"
+    order_number = f"ORD-{now.year:04d}{now.month:02d}{now.day:02d}{now.hour:02d}{now.minute:02d}{now.second:02d}"
 
     data = order.model_dump()
     data.update({
         "order_number": order_number,
         "total_amount": total_amount,
         "status": "pending",
-        "created_at": now,
-        "updated_at": now,
+        **creation_stamps(now),
     })
 
-    inserted_id = db.order.insert_one(data).inserted_id
+    inserted_id = (await db.order.insert_one(data)).inserted_id
     return OrderOut(
         id=str(inserted_id),
         order_number=order_number,
@@ -310,22 +535,22 @@ def create_order(order: OrderIn):
 
 
 @app.get("/api/orders/{order_id}")
-def get_order(order_id: str):
+async def get_order(order_id: str):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    doc = db.order.find_one({"_id": to_object_id(order_id)})
+    doc = await db.order.find_one({"_id": to_object_id(order_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Order not found")
     return serialize_doc(doc)
 
 
 @app.put("/api/orders/{order_id}/status")
-def update_order_status(order_id: str, status: str):
+async def update_order_status(order_id: str, status: str):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    res = db.order.update_one(
+    res = await db.order.update_one(
         {"_id": to_object_id(order_id)},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
+        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -336,162 +561,143 @@ def update_order_status(order_id: str, status: str):
 # Seed endpoint (optional for demo)
 # -----------------------------
 
+# Static catalog for demo seeding; timestamps are stamped at insert time
+_SAMPLE_PRODUCTS_TEMPLATE = (
+    {
+        "name": "Classic Tee",
+        "brand": "Secret",
+        "price": 29.99,
+        "sale_price": 24.99,
+        "category": "Apparel",
+        "description": "Soft cotton tee",
+        "specs": {"material": "100% Cotton"},
+        "images": ["https://images.unsplash.com/photo-1512436991641-6745cdb1723f?q=80&w=800&auto=format&fit=crop"],
+        "stock": 42,
+        "options": {"size": ["S","M","L","XL"], "color": ["Black","White"]},
+        "is_featured": True,
+        "tags": ["bestseller", "new"],
+        "rating": {"average": 4.6, "count": 120}
+    },
+    {
+        "name": "Everyday Jeans",
+        "brand": "Secret",
+        "price": 59.0,
+        "category": "Apparel",
+        "description": "Slim fit denim",
+        "specs": {"material": "Denim"},
+        "images": ["https://images.unsplash.com/photo-1519741497674-611481863552?q=80&w=800&auto=format&fit=crop"],
+        "stock": 18,
+        "options": {"size": ["28","30","32","34"], "color": ["Blue","Dark Blue"]},
+        "is_featured": False,
+        "tags": ["denim"],
+        "rating": {"average": 4.3, "count": 80}
+    },
+    {
+        "name": "Minimal Sneakers",
+        "brand": "Secret",
+        "price": 79.0,
+        "sale_price": 69.0,
+        "category": "Footwear",
+        "description": "Clean silhouette",
+        "specs": {"material": "Vegan leather"},
+        "images": ["https://images.unsplash.com/photo-1542291026-7eec264c27ff?q=80&w=800&auto=format&fit=crop"],
+        "stock": 25,
+        "options": {"size": ["7","8","9","10","11"], "color": ["White","Black"]},
+        "is_featured": True,
+        "tags": ["sneakers", "minimal"],
+        "rating": {"average": 4.8, "count": 200}
+    },
+    {
+        "name": "No. 7 Eau de Parfum",
+        "brand": "Secret Scents",
+        "price": 110.0,
+        "category": "Fragrance",
+        "description": "Amber, vanilla and cedar. Long-lasting.",
+        "specs": {"volume": "50ml"},
+        "images": ["https://images.unsplash.com/photo-1616606347407-23ca041ac856?q=80&w=800&auto=format&fit=crop"],
+        "stock": 12,
+        "options": {"volume": ["30ml","50ml","100ml"]},
+        "is_featured": True,
+        "tags": ["perfume","fragrance"],
+        "rating": {"average": 4.9, "count": 310}
+    }
+)
+
+
+def build_sample_products() -> List[Dict[str, Any]]:
+    stamps = creation_stamps(datetime.now(timezone.utc))
+    # `seed` marks demo docs so only their names are held unique
+    return [dict(p, **stamps, seed=True) for p in _SAMPLE_PRODUCTS_TEMPLATE]
+
+
+async def insert_sample_products() -> int:
+    """Insert the demo catalog; concurrent callers are deduplicated by the seed_name_unique index"""
+    try:
+        return len((await db.product.insert_many(build_sample_products(), ordered=False)).inserted_ids)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+
 @app.post("/api/admin/seed")
-def seed_products():
+async def seed_products():
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    if db.product.count_documents({}) > 0:
+    # Stops at the first _id instead of counting the collection
+    if await db.product.find_one({}, {"_id": 1}) is not None:
         return {"message": "Products already seeded"}
-    sample = [
-        {
-            "name": "Classic Tee",
-            "brand": "Secret",
-            "price": 29.99,
-            "sale_price": 24.99,
-            "category": "Apparel",
-            "description": "Soft cotton tee",
-            "specs": {"material": "100% Cotton"},
-            "images": ["https://images.unsplash.com/photo-1512436991641-6745cdb1723f?q=80&w=800&auto=format&fit=crop"],
-            "stock": 42,
-            "options": {"size": ["S","M","L","XL"], "color": ["Black","White"]},
-            "is_featured": True,
-            "tags": ["bestseller", "new"],
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-            "rating": {"average": 4.6, "count": 120}
-        },
-        {
-            "name": "Everyday Jeans",
-            "brand": "Secret",
-            "price": 59.0,
-            "category": "Apparel",
-            "description": "Slim fit denim",
-            "specs": {"material": "Denim"},
-            "images": ["https://images.unsplash.com/photo-1519741497674-611481863552?q=80&w=800&auto=format&fit=crop"],
-            "stock": 18,
-            "options": {"size": ["28","30","32","34"], "color": ["Blue","Dark Blue"]},
-            "is_featured": False,
-            "tags": ["denim"],
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-            "rating": {"average": 4.3, "count": 80}
-        },
-        {
-            "name": "Minimal Sneakers",
-            "brand": "Secret",
-            "price": 79.0,
-            "sale_price": 69.0,
-            "category": "Footwear",
-            "description": "Clean silhouette",
-            "specs": {"material": "Vegan leather"},
-            "images": ["https://images.unsplash.com/photo-1542291026-7eec264c27ff?q=80&w=800&auto=format&fit=crop"],
-            "stock": 25,
-            "options": {"size": ["7","8","9","10","11"], "color": ["White","Black"]},
-            "is_featured": True,
-            "tags": ["sneakers", "minimal"],
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-            "rating": {"average": 4.8, "count": 200}
-        },
-        {
-            "name": "No. 7 Eau de Parfum",
-            "brand": "Secret Scents",
-            "price": 110.0,
-            "category": "Fragrance",
-            "description": "Amber, vanilla and cedar. Long-lasting.",
-            "specs": {"volume": "50ml"},
-            "images": ["https://images.unsplash.com/photo-1616606347407-23ca041ac856?q=80&w=800&auto=format&fit=crop"],
-            "stock": 12,
-            "options": {"volume": ["30ml","50ml","100ml"]},
-            "is_featured": True,
-            "tags": ["perfume","fragrance"],
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-            "rating": {"average": 4.9, "count": 310}
-        }
-    ]
-    db.product.insert_many(sample)
-    return {"message": "Seeded sample products", "count": len(sample)}
+    count = await insert_sample_products()
+    clear_product_caches()
+    return {"message": "Seeded sample products", "count": count}
+
+
+# -----------------------------
+# Indexes
+# -----------------------------
+
+@app.on_event("startup")
+async def ensure_indexes():
+    if db is None:
+        return
+    try:
+        # Unique only among seeded demo products; admin-created names may repeat
+        await db.product.create_index(
+            [("name", 1)],
+            unique=True,
+            partialFilterExpression={"seed": True},
+            name="seed_name_unique",
+        )
+        await db.product.create_index([("name", 1)], collation=NAME_COLLATION)
+        # (sort key, _id) pairs back keyset pagination in list_products
+        await db.product.create_index([("price", 1), ("_id", 1)])
+        await db.product.create_index([("created_at_ts", -1), ("_id", -1)])
+        await db.product.create_index([("rating.count", -1), ("_id", -1)])
+        # Category listings: equality on category, then the sort (ESR)
+        await db.product.create_index([("category", 1), ("price", 1), ("_id", 1)])
+        await db.product.create_index([("category", 1), ("created_at_ts", -1), ("_id", -1)])
+        await db.product.create_index([("category", 1), ("rating.count", -1), ("_id", -1)])
+        await db.product.create_index(
+            [("name", "text"), ("brand", "text"), ("category", "text"), ("tags", "text")],
+            weights={"name": 10, "tags": 5, "brand": 3, "category": 1},
+        )
+    except Exception:
+        # Index builds must not block startup
+        pass
 
 
 # -----------------------------
-# Auto-seed on startup so homepage is never empty
+# Optional auto-seed on startup (SEED_ON_STARTUP=1) so homepage is never empty
 # -----------------------------
 
 @app.on_event("startup")
 async def ensure_seed_on_startup():
+    # Opt-in: otherwise every worker would probe Mongo before serving traffic
+    if os.getenv("SEED_ON_STARTUP") != "1":
+        return
     try:
-        if db is not None and db.product.count_documents({}) == 0:
-            await app.router.lifespan_context(app) if False else None  # no-op to keep async signature lint-happy
-            sample = [
-                {
-                    "name": "Classic Tee",
-                    "brand": "Secret",
-                    "price": 29.99,
-                    "sale_price": 24.99,
-                    "category": "Apparel",
-                    "description": "Soft cotton tee",
-                    "specs": {"material": "100% Cotton"},
-                    "images": ["https://images.unsplash.com/photo-1512436991641-6745cdb1723f?q=80&w=800&auto=format&fit=crop"],
-                    "stock": 42,
-                    "options": {"size": ["S","M","L","XL"], "color": ["Black","White"]},
-                    "is_featured": True,
-                    "tags": ["bestseller", "new"],
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc),
-                    "rating": {"average": 4.6, "count": 120}
-                },
-                {
-                    "name": "Everyday Jeans",
-                    "brand": "Secret",
-                    "price": 59.0,
-                    "category": "Apparel",
-                    "description": "Slim fit denim",
-                    "specs": {"material": "Denim"},
-                    "images": ["https://images.unsplash.com/photo-1519741497674-611481863552?q=80&w=800&auto=format&fit=crop"],
-                    "stock": 18,
-                    "options": {"size": ["28","30","32","34"], "color": ["Blue","Dark Blue"]},
-                    "is_featured": False,
-                    "tags": ["denim"],
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc),
-                    "rating": {"average": 4.3, "count": 80}
-                },
-                {
-                    "name": "Minimal Sneakers",
-                    "brand": "Secret",
-                    "price": 79.0,
-                    "sale_price": 69.0,
-                    "category": "Footwear",
-                    "description": "Clean silhouette",
-                    "specs": {"material": "Vegan leather"},
-                    "images": ["https://images.unsplash.com/photo-1542291026-7eec264c27ff?q=80&w=800&auto=format&fit=crop"],
-                    "stock": 25,
-                    "options": {"size": ["7","8","9","10","11"], "color": ["White","Black"]},
-                    "is_featured": True,
-                    "tags": ["sneakers", "minimal"],
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc),
-                    "rating": {"average": 4.8, "count": 200}
-                },
-                {
-                    "name": "No. 7 Eau de Parfum",
-                    "brand": "Secret Scents",
-                    "price": 110.0,
-                    "category": "Fragrance",
-                    "description": "Amber, vanilla and cedar. Long-lasting.",
-                    "specs": {"volume": "50ml"},
-                    "images": ["https://images.unsplash.com/photo-1616606347407-23ca041ac856?q=80&w=800&auto=format&fit=crop"],
-                    "stock": 12,
-                    "options": {"volume": ["30ml","50ml","100ml"]},
-                    "is_featured": True,
-                    "tags": ["perfume","fragrance"],
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc),
-                    "rating": {"average": 4.9, "count": 310}
-                }
-            ]
-            db.product.insert_many(sample)
+        if db is not None and await db.product.find_one({}, {"_id": 1}) is None:
+            await insert_sample_products()
     except Exception:
         # Swallow seeding errors to not block startup
         pass